@@ -0,0 +1,254 @@
+"""ETL connector for the CIRCL Passive DNS API.
+
+Extracts passive DNS records for a set of queries via pypdns, transforms
+them into flat documents and bulk-loads them into MongoDB. The queries
+are independent, so they run concurrently on a bounded thread pool.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from operator import itemgetter
+from threading import Lock
+
+import orjson
+import pypdns
+import requests
+import zstandard
+from bson import Binary
+from pypdns.errors import RateLimitError, ServerError
+from pybloom_live import ScalableBloomFilter
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from etl_utils import chunked, get_logger
+
+load_dotenv()
+
+log = get_logger("circl_pdns_etl")
+
+CIRCL_USER = os.getenv("CIRCL_USER")
+CIRCL_PASS = os.getenv("CIRCL_PASS")
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "etl_db")
+
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2  # seconds, doubled on each retry
+MAX_WORKERS = 4
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # seconds
+CACHE_FILE = os.getenv("CIRCL_CACHE_FILE", "circl_cache")
+# Retaining the source record roughly doubles bytes on the wire and on
+# disk; keep it only for audit runs.
+KEEP_RAW = os.getenv("KEEP_RAW", "0") == "1"
+
+# Raw threat-intel dumps tolerate fire-and-forget writes; w=0 skips the
+# per-insert primary ack and zstd compresses the wire protocol.
+client = MongoClient(MONGO_URI, w=0, journal=False, compressors="zstd")
+db = client[DB_NAME]
+collection = db["circl_pdns"]
+
+_PDNS_INDEX = [("rrname", 1), ("rrtype", 1), ("rdata", 1)]
+
+
+def ensure_indexes():
+    """Ensure the unique identity index, upgrading a legacy non-unique one."""
+    name = "rrname_1_rrtype_1_rdata_1"
+    existing = {index["name"]: index for index in collection.list_indexes()}
+    index = existing.get(name)
+    if index is not None and not index.get("unique"):
+        collection.drop_index(name)
+        index = None
+    if index is None:
+        collection.create_index(_PDNS_INDEX, unique=True, name=name)
+
+# Single client so the authenticated HTTPS connection is reused across
+# queries instead of paying a TCP+TLS handshake per call. The built-in
+# cache persists responses to a requests-cache SQLite file, so repeat
+# runs within CACHE_TTL skip the network entirely.
+_PDNS = pypdns.PyPDNS(
+    basic_auth=(CIRCL_USER, CIRCL_PASS),
+    enable_cache=True,
+    cache_expire_after=CACHE_TTL,
+    cache_file=CACHE_FILE,
+)
+
+hardcoded_queries = [
+    {"q": "circl.lu", "rrtype": None},
+    {"q": "google.com", "rrtype": "A"},
+    {"q": "example.com", "rrtype": "AAAA"},
+    {"q": "cloudflare.com", "rrtype": "NS"},
+]
+
+
+# ---------------------------------------------------------------- extract
+
+def extract_pdns(q, rrtype=None):
+    """Query CIRCL PDNS for ``q``, retrying transient failures with backoff.
+
+    Only transport errors and pypdns's rate-limit/server-error exceptions
+    are retried; permanent failures (UnauthorizedError, ForbiddenError)
+    propagate immediately since they will never succeed on retry.
+    Responses come from the client's persistent SQLite cache when a
+    previous run fetched them within the last CACHE_TTL seconds.
+    """
+    retries = 0
+    while True:
+        try:
+            return _PDNS.rfc_query(q, filter_rrtype=rrtype)
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            RateLimitError,
+            ServerError,
+        ) as exc:
+            retries += 1
+            if retries > MAX_RETRIES:
+                raise
+            sleep_for = RETRY_BACKOFF ** retries
+            log.warning(
+                "extract_pdns(%r) failed (%s); retry %d in %ss", q, exc, retries, sleep_for
+            )
+            time.sleep(sleep_for)
+
+
+# -------------------------------------------------------------- transform
+
+# Required COF fields, guaranteed present on every CIRCL PDNS record;
+# count and origin are optional and handled with .get() below.
+_PDNS_FIELDS = ("rrname", "rrtype", "rdata", "time_first", "time_last")
+_PROJECT = itemgetter(*_PDNS_FIELDS)
+
+ZSTD_LEVEL = 3  # throughput sweet spot for small JSON payloads
+
+
+def _compress_raw(rec):
+    """Serialize and zstd-compress the original record for audit storage."""
+    return Binary(zstandard.compress(orjson.dumps(rec, default=str), ZSTD_LEVEL))
+
+
+def transform_record_fast(rec, q, ts=None):
+    """Flatten a plain record dict into a document ready for MongoDB.
+
+    The projection uses a precompiled itemgetter over the required COF
+    fields and a single dict(zip()) rather than one .get() per field,
+    which is measurably cheaper across millions of records. Callers must
+    pass a dict; use transform_record for values of unknown shape.
+    """
+    doc = dict(zip(_PDNS_FIELDS, _PROJECT(rec)))
+    doc |= {
+        "count": rec.get("count"),
+        "origin": rec.get("origin"),
+        "query": q,
+        "_etl_ingested_at": ts or datetime.utcnow(),
+    }
+    if KEEP_RAW:
+        doc["_raw_zst"] = _compress_raw(rec)
+    return doc
+
+
+def transform_record(pypdns_record, q, ts=None):
+    """Tolerant wrapper that unwraps whatever shape pypdns handed back."""
+    try:
+        rec = pypdns_record.record
+    except AttributeError:
+        rec = pypdns_record if isinstance(pypdns_record, dict) else dict(pypdns_record)
+    return transform_record_fast(rec, q, ts)
+
+
+# ------------------------------------------------------------------ load
+
+def load_batch_to_mongo(docs):
+    """Idempotently upsert a batch keyed on (rrname, rrtype, rdata).
+
+    Re-ingesting a record updates it in place, with $min/$max merging the
+    observation window when the same triple arrives from several sources.
+    """
+    if not docs:
+        return 0
+    ops = []
+    for doc in docs:
+        doc = dict(doc)
+        time_first = doc.pop("time_first", None)
+        time_last = doc.pop("time_last", None)
+        update = {"$set": doc}
+        if time_first is not None:
+            update["$min"] = {"time_first": time_first}
+        if time_last is not None:
+            update["$max"] = {"time_last": time_last}
+        ops.append(
+            UpdateOne(
+                {
+                    "rrname": doc["rrname"],
+                    "rrtype": doc["rrtype"],
+                    "rdata": doc["rdata"],
+                },
+                update,
+                upsert=True,
+            )
+        )
+    collection.bulk_write(ops, ordered=False)
+    log.info("Upserted %d documents into %s", len(ops), collection.name)
+    return len(ops)
+
+
+# ------------------------------------------------------------------ main
+
+# PDNS records repeat heavily across queries (CNAME churn especially);
+# a Bloom filter over the identity triple skips known duplicates without
+# a Mongo round-trip, at ~1 bit per element of RAM.
+_seen = ScalableBloomFilter(initial_capacity=1_000_000, error_rate=0.001)
+_seen_lock = Lock()
+
+
+def _is_duplicate(doc):
+    """Record the doc's (rrname, rrtype, rdata) triple; True if already seen."""
+    key = f"{doc['rrname']}|{doc['rrtype']}|{doc['rdata']}"
+    with _seen_lock:
+        if key in _seen:
+            return True
+        _seen.add(key)
+    return False
+
+
+def run_etl(q, rrtype=None):
+    """Run extract -> transform -> load for a single query."""
+    records = extract_pdns(q, rrtype=rrtype)
+    total = 0
+    # One timestamp per batch: a per-record utcnow() is a syscall plus an
+    # allocation, and the ingest time is the same for the whole run anyway.
+    batch_ts = datetime.utcnow()
+    # pypdns returns a homogeneous batch, so probe the first record once:
+    # rfc_query yields PDNSRecord wrappers whose .record dict goes straight
+    # into the no-checks fast path, plain dicts go there directly, and
+    # anything else takes the tolerant wrapper.
+    if records and hasattr(records[0], "record"):
+        def transform(rec, q, ts):
+            return transform_record_fast(rec.record, q, ts)
+    elif records and isinstance(records[0], dict):
+        transform = transform_record_fast
+    else:
+        transform = transform_record
+    docs = (
+        doc
+        for doc in (transform(rec, q, batch_ts) for rec in records)
+        if not _is_duplicate(doc)
+    )
+    for batch in chunked(docs):
+        total += load_batch_to_mongo(batch)
+    log.info("run_etl(%r, rrtype=%r) loaded %d documents", q, rrtype, total)
+    return total
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(hardcoded_queries))) as pool:
+        futures = {
+            pool.submit(run_etl, **job): job["q"] for job in hardcoded_queries
+        }
+        for future in as_completed(futures):
+            q = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                log.error("ETL failed for %r: %s", q, exc)
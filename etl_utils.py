@@ -0,0 +1,49 @@
+"""Helpers shared by the ETL connectors."""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+BATCH_SIZE = 500
+
+try:
+    # Python 3.12+: C-implemented batching, ~2x faster than islice+list.
+    from itertools import batched
+
+    def chunked(iterable, size=BATCH_SIZE):
+        """Yield successive batches of at most ``size`` items from ``iterable``."""
+        return batched(iterable, size)
+
+except ImportError:
+    from itertools import islice
+
+    def chunked(iterable, size=BATCH_SIZE):
+        """Yield successive batches of at most ``size`` items from ``iterable``."""
+        iterator = iter(iterable)
+        while chunk := list(islice(iterator, size)):
+            yield chunk
+
+
+_logging_configured = False
+
+
+def get_logger(name):
+    """Return a logger whose records are written on a background thread.
+
+    Log records go through a queue to a QueueListener, so the ETL hot
+    loop never blocks on stdout flushes.
+    """
+    global _logging_configured
+    if not _logging_configured:
+        log_queue = queue.SimpleQueue()
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+        _logging_configured = True
+    return logging.getLogger(name)